@@ -1,8 +1,21 @@
+import os
 import sys
+import json
+import hashlib
 import subprocess
 import threading
 import logging
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
+from sqlalchemy.exc import SQLAlchemyError
+
+import config
+from src.utils import get_db_engine, generate_run_id
+from src.results_store import (
+    list_runs,
+    get_run,
+    fetch_results_page,
+    summarize_run
+)
 
 # --- Configuration ---
 # Set up logging to see server and script status
@@ -18,25 +31,46 @@ logging.basicConfig(
 app = Flask(__name__)
 is_backtest_running = False
 backtest_lock = threading.Lock()
+current_run_id = None
+
+# Engine is created on first use so the server can start before the DB is up
+db_engine = None
+db_engine_lock = threading.Lock()
+
+# Summaries of finished runs never change, so they are cached as (etag, payload)
+summary_cache = {}
+summary_cache_lock = threading.Lock()
+FINISHED_RUN_STATUSES = ("completed", "failed")
+
+def get_engine():
+    """Returns the shared SQLAlchemy engine, creating it on first use."""
+    global db_engine
+    with db_engine_lock:
+        if db_engine is None:
+            db_engine = get_db_engine(config.DATABASE_URL)
+        return db_engine
 
 # --- Background Task ---
-def run_backtest_script():
+def run_backtest_script(run_id: str):
     """
-    Runs the main.py script in a separate process.
-    This function is designed to be run in a background thread.
+    Runs the main.py script (or coordinator.py in distributed mode) in a
+    separate process. This function is designed to be run in a background thread.
+    The run_id is handed to the script so results are stored under it.
     """
-    global is_backtest_running
+    global is_backtest_running, current_run_id
 
     # Use sys.executable to ensure it uses the same Python interpreter
     # that is running the Flask app.
     try:
-        logging.info("Backtest script started...")
-        # This will run 'python main.py'
+        logging.info(f"Backtest script started for run {run_id}...")
+        # This will run 'python main.py' or 'python coordinator.py'
+        script = 'coordinator.py' if config.DISTRIBUTED_MODE else 'main.py'
         subprocess.run(
-            [sys.executable, 'main.py'],
+            [sys.executable, script],
             check=True,         # Will raise an error if main.py fails
             capture_output=True, # Captures stdout and stderr
-            text=True
+            text=True,
+            env={**os.environ, "BACKTEST_RUN_ID": run_id}
         )
         logging.info("Backtest script finished successfully.")
     except subprocess.CalledProcessError as e:
@@ -48,6 +82,7 @@ def run_backtest_script():
         # Use the lock to safely update the shared variable
         with backtest_lock:
             is_backtest_running = False
+            current_run_id = None
             logging.info("Backtest status set to 'not running'.")
 
 
@@ -57,7 +92,7 @@ def start_backtest():
     """
     API endpoint to trigger the backtest.
     """
-    global is_backtest_running
+    global is_backtest_running, current_run_id
 
     # Check if a backtest is already in progress
     with backtest_lock:
@@ -71,17 +106,20 @@ def start_backtest():
 
         # If not running, set the flag and start the thread
         is_backtest_running = True
-        logging.info("Received /start request. Starting backtest in background thread...")
+        run_id = generate_run_id()
+        current_run_id = run_id
+        logging.info(f"Received /start request. Starting backtest {run_id} in background thread...")
 
         # Start the backtest in a new thread.
         # This allows us to return an HTTP response immediately
         # without waiting for the (potentially long) backtest to finish.
-        thread = threading.Thread(target=run_backtest_script, name="BacktestRunner")
+        thread = threading.Thread(target=run_backtest_script, args=(run_id,), name="BacktestRunner")
         thread.start()
 
     # Return an "Accepted" status, indicating the job has started
     return jsonify({
         "status": "success",
+        "run_id": run_id,
         "message": "Backtest started in the background. Check logs for progress."
     }), 202
 
@@ -92,10 +130,114 @@ def get_status():
     """
     with backtest_lock:
         if is_backtest_running:
-            return jsonify({"status": "running", "message": "A backtest is currently in progress."})
+            return jsonify({"status": "running", "run_id": current_run_id,
+                            "message": "A backtest is currently in progress."})
         else:
             return jsonify({"status": "idle", "message": "No backtest is running."})
 
+# --- Results API ---
+def _page_size_arg() -> int:
+    """Reads ?limit= from the request, clamped to the configured maximum."""
+    limit = request.args.get('limit', default=config.RESULTS_PAGE_SIZE, type=int)
+    return max(1, min(limit, config.RESULTS_MAX_PAGE_SIZE))
+
+def _results_page(table_name: str, run_id: str):
+    """Shared handler for the paginated signals and trades endpoints."""
+    engine = get_engine()
+    if engine is None:
+        return jsonify({"status": "error", "message": "Database is not configured."}), 503
+
+    limit = _page_size_arg()
+    try:
+        rows, next_cursor = fetch_results_page(engine, table_name, run_id, limit,
+                                               cursor=request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    return jsonify({"run_id": run_id, "count": len(rows), "next_cursor": next_cursor, "data": rows})
+
+@app.errorhandler(SQLAlchemyError)
+def handle_db_error(e):
+    logging.error(f"Database error while serving {request.path}: {e}")
+    return jsonify({"status": "error", "message": "Database query failed."}), 500
+
+@app.route('/runs', methods=['GET'])
+def get_runs():
+    """
+    API endpoint listing runs (newest first) with their params, timings and data window.
+    Paged with ?limit= and ?offset= (the runs table is small).
+    """
+    engine = get_engine()
+    if engine is None:
+        return jsonify({"status": "error", "message": "Database is not configured."}), 503
+
+    limit = _page_size_arg()
+    offset = max(0, request.args.get('offset', default=0, type=int))
+    runs = list_runs(engine, config.RUNS_TABLE_NAME, limit, offset)
+    return jsonify({"count": len(runs), "offset": offset, "data": runs})
+
+@app.route('/runs/<run_id>', methods=['GET'])
+def get_run_metadata(run_id):
+    """API endpoint returning the metadata of a single run."""
+    engine = get_engine()
+    if engine is None:
+        return jsonify({"status": "error", "message": "Database is not configured."}), 503
+
+    run = get_run(engine, config.RUNS_TABLE_NAME, run_id)
+    if run is None:
+        return jsonify({"status": "error", "message": f"Run {run_id} not found."}), 404
+    return jsonify(run)
+
+@app.route('/runs/<run_id>/signals', methods=['GET'])
+def get_run_signals(run_id):
+    """
+    API endpoint paging through a run's signals.
+    Pass the returned `next_cursor` as ?cursor= to get the next page.
+    """
+    return _results_page(config.SIGNALS_TABLE_NAME, run_id)
+
+@app.route('/runs/<run_id>/trades', methods=['GET'])
+def get_run_trades(run_id):
+    """
+    API endpoint paging through a run's backtested trades.
+    Pass the returned `next_cursor` as ?cursor= to get the next page.
+    """
+    return _results_page(config.BACKTEST_TABLE_NAME, run_id)
+
+@app.route('/runs/<run_id>/summary', methods=['GET'])
+def get_run_summary(run_id):
+    """
+    API endpoint returning a run's aggregated summary.
+    Supports ETag / If-None-Match, so polling clients get a 304 when nothing changed.
+    Summaries of finished runs are cached in memory; running ones are recomputed.
+    """
+    with summary_cache_lock:
+        cached = summary_cache.get(run_id)
+
+    if cached is None:
+        engine = get_engine()
+        if engine is None:
+            return jsonify({"status": "error", "message": "Database is not configured."}), 503
+
+        run = get_run(engine, config.RUNS_TABLE_NAME, run_id)
+        if run is None:
+            return jsonify({"status": "error", "message": f"Run {run_id} not found."}), 404
+
+        payload = summarize_run(engine, config.SIGNALS_TABLE_NAME, config.BACKTEST_TABLE_NAME, run_id)
+        payload["status"] = run["status"]
+        etag = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        cached = (etag, payload)
+
+        if run["status"] in FINISHED_RUN_STATUSES:
+            with summary_cache_lock:
+                summary_cache[run_id] = cached
+
+    etag, payload = cached
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Always revalidate; 304 is cheap
+    return response.make_conditional(request)
+
 # --- Run the Server ---
 if __name__ == '__main__':
     logging.info(f"Starting web server. Access on http://<your_ip>:8080")
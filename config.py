@@ -55,6 +55,34 @@ RAW_DATA_TABLE_NAME = "raw_candle_data"
 SIGNALS_TABLE_NAME = f"generated_signals_{STRATEGY_NAME.lower()}"
 # EXISTING: Table for final backtest P&L
 BACKTEST_TABLE_NAME = f"backtest_results_{STRATEGY_NAME.lower()}"
+# NEW: Table for per-run metadata (params, timings, data window)
+RUNS_TABLE_NAME = "backtest_runs"
+
+# --- Candle Store Configuration ---
+# Local memory-mapped columnar copy of the raw candles (one file per symbol per
+# month). Stage 2 reads from it instead of re-querying MySQL, which remains the
+# system of record.
+USE_CANDLE_STORE = os.getenv("USE_CANDLE_STORE", "true").lower() == "true"
+CANDLE_STORE_DIR = os.getenv("CANDLE_STORE_DIR", "candle_store")
+
+# --- Distributed Mode Configuration ---
+# When enabled, /start launches coordinator.py, which queues symbol batches in
+# JOBS_TABLE_NAME for worker.py containers instead of running main.py in-process.
+DISTRIBUTED_MODE = os.getenv("DISTRIBUTED_MODE", "false").lower() == "true"
+JOBS_TABLE_NAME = "backtest_jobs"
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "10"))  # Symbols per job
+WORKER_POLL_SECONDS = 5        # How long an idle worker waits before polling again
+WORKER_HEARTBEAT_SECONDS = 15  # How often a busy worker refreshes its claim
+WORKER_STALE_SECONDS = 90      # A claim without a heartbeat this long is retried
+JOB_MAX_ATTEMPTS = 3           # After this many claims a job is marked failed
+COORDINATOR_POLL_SECONDS = 10
+# A distributed run still unfinished after this long is failed and its
+# leftover jobs are cancelled (e.g. no workers running, or all crash-looping).
+RUN_TIMEOUT_SECONDS = int(os.getenv("RUN_TIMEOUT_SECONDS", "7200"))
+
+# --- Results API Configuration ---
+RESULTS_PAGE_SIZE = 100       # Default rows per page for /runs/<id>/signals and /trades
+RESULTS_MAX_PAGE_SIZE = 1000  # Hard cap so one request can't pull a whole table
 
 
 # Ensure the results directory exists (for logs)
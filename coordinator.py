@@ -0,0 +1,129 @@
+import os
+import time
+import logging
+
+# Import from our config and modules
+import config
+from src.utils import (
+    setup_logging,
+    load_stocks_list,
+    get_db_engine,
+    generate_run_id,
+    prepare_output_tables,
+    start_run,
+    finish_run
+)
+from src.pipeline import build_run_params
+from src.results_store import summarize_run
+from src.job_queue import (
+    ensure_jobs_table,
+    enqueue_run,
+    reap_stale_jobs,
+    cancel_run_jobs,
+    expire_abandoned_runs,
+    get_run_progress,
+    get_run_totals
+)
+
+def wait_for_jobs(engine, run_id: str) -> dict:
+    """
+    Polls the jobs table until no job of the run is pending or running, or until
+    RUN_TIMEOUT_SECONDS have passed, in which case the leftover jobs are cancelled.
+    Returns the final progress.
+    """
+    deadline = time.monotonic() + config.RUN_TIMEOUT_SECONDS
+    while True:
+        reap_stale_jobs(engine, config.JOBS_TABLE_NAME, run_id,
+                        config.WORKER_STALE_SECONDS, config.JOB_MAX_ATTEMPTS)
+        progress = get_run_progress(engine, config.JOBS_TABLE_NAME, run_id)
+
+        outstanding = progress.get("pending", 0) + progress.get("running", 0)
+        logging.info(f"Run {run_id} progress: {progress}")
+        if outstanding == 0:
+            return progress
+
+        if time.monotonic() >= deadline:
+            logging.error(f"Run {run_id} timed out after {config.RUN_TIMEOUT_SECONDS}s "
+                          f"with {outstanding} jobs outstanding. Are any workers running?")
+            cancel_run_jobs(engine, config.JOBS_TABLE_NAME, run_id, "Run timed out.")
+            return get_run_progress(engine, config.JOBS_TABLE_NAME, run_id)
+
+        time.sleep(config.COORDINATOR_POLL_SECONDS)
+
+def main():
+    """
+    Coordinator for distributed mode:
+    1. Register the run and queue one job per batch of WORKER_BATCH_SIZE symbols.
+    2. Wait while worker.py containers fetch, generate signals and backtest the batches.
+    3. Finalize the run from the jobs' statistics and log the combined summary.
+    """
+    setup_logging()
+    run_id = os.environ.get("BACKTEST_RUN_ID") or generate_run_id()
+    logging.info(f"Starting distributed backtest for: {config.STRATEGY_NAME} (run {run_id})")
+
+    logging.info(f"Loading stock list from: {config.STOCKS_CSV_PATH}")
+    stocks_df = load_stocks_list(config.STOCKS_CSV_PATH)
+
+    engine = get_db_engine(config.DATABASE_URL)
+    if engine is None:
+        logging.error("Failed to initialize DB engine. Exiting.")
+        return
+
+    ensure_jobs_table(engine, config.JOBS_TABLE_NAME)
+    # Workers write concurrently, so the tables (and any pre-versioning rename)
+    # must exist before the first job is claimed
+    prepare_output_tables(engine, config.RAW_DATA_TABLE_NAME,
+                          config.SIGNALS_TABLE_NAME, config.BACKTEST_TABLE_NAME)
+    # Workers only claim jobs of a registered, running run
+    if not start_run(engine, config.RUNS_TABLE_NAME, run_id, config.STRATEGY_NAME,
+                     build_run_params(len(stocks_df), distributed=True, batch_size=config.WORKER_BATCH_SIZE)):
+        logging.error(f"Could not register run {run_id}. Exiting without queueing jobs.")
+        return
+
+    # Clean up after coordinators that died mid-run, so their jobs stop being claimed
+    expire_abandoned_runs(engine, config.RUNS_TABLE_NAME, config.JOBS_TABLE_NAME, config.RUN_TIMEOUT_SECONDS)
+
+    run_info = {"timings": {}}
+    run_status = "failed"
+    run_start = time.perf_counter()
+    try:
+        num_jobs = enqueue_run(engine, config.JOBS_TABLE_NAME, run_id, stocks_df, config.WORKER_BATCH_SIZE)
+        if num_jobs == 0:
+            logging.error("No stocks to process. Exiting.")
+            return
+
+        progress = wait_for_jobs(engine, run_id)
+
+        totals = get_run_totals(engine, config.JOBS_TABLE_NAME, run_id)
+        run_info["data_start"] = totals["data_start"]
+        run_info["data_end"] = totals["data_end"]
+        run_info["num_symbols"] = int(totals["num_symbols"] or 0)
+        run_info["num_signals"] = int(totals["num_signals"] or 0)
+        run_info["num_trades"] = int(totals["num_trades"] or 0)
+        # Stage timings are summed across workers (CPU-seconds spent), plus the wall time of the run
+        for stage in ("fetch_seconds", "signals_seconds", "backtest_seconds"):
+            run_info["timings"][stage] = round(float(totals[stage] or 0), 3)
+        run_info["timings"]["wall_seconds"] = round(time.perf_counter() - run_start, 3)
+
+        failed_jobs = progress.get("failed", 0)
+        if failed_jobs:
+            logging.error(f"{failed_jobs} of {num_jobs} jobs failed. Results for run {run_id} are incomplete.")
+        else:
+            run_status = "completed"
+
+        if run_info["num_trades"] == 0:
+            logging.warning("Backtest completed but produced no trades.")
+        else:
+            summary = summarize_run(engine, config.SIGNALS_TABLE_NAME, config.BACKTEST_TABLE_NAME, run_id)
+            logging.info("--- Backtest Summary ---")
+            logging.info(f"Total Trades: {summary['total_trades']}")
+            logging.info(f"Wins: {summary['wins']} | Losses: {summary['losses']}")
+            logging.info(f"Win Rate: {summary['win_rate']:.2f}%")
+            logging.info(f"Overall Profit/Loss: {summary['total_profit_loss']:.2f}")
+    finally:
+        finish_run(engine, config.RUNS_TABLE_NAME, run_id, run_status, run_info)
+
+    logging.info("Distributed backtest run finished.")
+
+if __name__ == "__main__":
+    main()
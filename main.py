@@ -1,3 +1,5 @@
+import os
+import time
 import pandas as pd
 import logging
 
@@ -9,10 +11,21 @@ from src.utils import (
     get_db_engine,
     save_candle_data_to_db,
     load_data_from_db,
-    save_results_to_db
+    save_results_to_db,
+    generate_run_id,
+    start_run,
+    finish_run
+)
+from src.data_fetcher import get_api_client
+from src.candle_store import CandleStore
+from src.pipeline import (
+    build_run_params,
+    fetch_all_stocks,
+    split_by_symbol,
+    load_via_candle_store,
+    build_session_indexes,
+    generate_all_signals
 )
-from src.data_fetcher import get_api_client, get_continuous_candles
-from src.strategy import generate_signals
 from src.backtester import backtest_strategy_combined
 
 def main():
@@ -21,9 +34,13 @@ def main():
     1. Fetch all stock data and save to DB.
     2. Load data from DB, generate signals, and save signals to DB.
     3. Run backtest on signals and save results to DB.
+
+    Every run gets a run_id (from BACKTEST_RUN_ID when launched by app.py);
+    signals and trades are stored under it and its metadata goes to the runs table.
     """
     setup_logging()
-    logging.info(f"Starting full backtest pipeline for: {config.STRATEGY_NAME}")
+    run_id = os.environ.get("BACKTEST_RUN_ID") or generate_run_id()
+    logging.info(f"Starting full backtest pipeline for: {config.STRATEGY_NAME} (run {run_id})")
 
     # 1. Load Stocks
     logging.info(f"Loading stock list from: {config.STOCKS_CSV_PATH}")
@@ -41,110 +58,96 @@ def main():
         logging.error("Failed to initialize DB engine. Exiting.")
         return
 
+    start_run(db_engine, config.RUNS_TABLE_NAME, run_id, config.STRATEGY_NAME,
+              build_run_params(len(stocks_df), candle_store=config.USE_CANDLE_STORE))
+
+    # Filled in as the stages complete and written to the runs table at the end
+    run_info = {"timings": {}}
+    run_status = "failed"
+    try:
+        run_status = run_pipeline(api, db_engine, stocks_df, run_id, run_info)
+    finally:
+        finish_run(db_engine, config.RUNS_TABLE_NAME, run_id, run_status, run_info)
+
+    logging.info("Backtest run finished.")
+
+def run_pipeline(api, db_engine, stocks_df: pd.DataFrame, run_id: str, run_info: dict) -> str:
+    """
+    Runs the three pipeline stages for one run.
+    Records stage timings, data window and row counts into `run_info`.
+    Returns the final run status: 'completed' or 'failed'.
+    """
+    stage_start = time.perf_counter()
+
     # =========================================================================
     # STAGE 1: FETCH DATA AND SAVE TO DATABASE
     # =========================================================================
     logging.info(f"--- STAGE 1: Fetching Data for {len(stocks_df)} stocks ---")
 
-    all_stocks_data_frames = [] # To store individual DFs before combining
-
-    for index, row in stocks_df.iterrows():
-        stock_symbol = row['Symbol']
-        instrument_key = f"NSE_EQ|{row['ISIN Code']}"
-        logging.info(f"Fetching: {stock_symbol} ({instrument_key})")
-
-        try:
-            df_5m = get_continuous_candles(
-                api=api,
-                instrument_key=instrument_key,
-                unit=config.DATA_INTERVAL_UNIT,
-                interval=config.DATA_INTERVAL_VALUE,
-                from_date=config.DATA_START_DATE,
-                tz=config.DATA_TIMEZONE
-            )
-
-            if not df_5m.empty:
-                # IMPORTANT: Add the symbol to the dataframe
-                df_5m['Symbol'] = stock_symbol
-                all_stocks_data_frames.append(df_5m)
-            else:
-                logging.warning(f"No data fetched for {stock_symbol}.")
-
-        except Exception as e:
-            logging.error(f"Error fetching data for {stock_symbol}: {e}", exc_info=True)
-
-    if not all_stocks_data_frames:
-        logging.error("No data fetched for any stock. Exiting.")
-        return
+    combined_raw_data_df = fetch_all_stocks(api, stocks_df)
 
-    # Combine all individual dataframes into one large one
-    combined_raw_data_df = pd.concat(all_stocks_data_frames)
+    if combined_raw_data_df.empty:
+        logging.error("No data fetched for any stock. Exiting.")
+        return "failed"
 
     # Save the combined dataframe to the database
     save_candle_data_to_db(combined_raw_data_df, db_engine, config.RAW_DATA_TABLE_NAME)
 
+    run_info["data_start"] = combined_raw_data_df.index.min()
+    run_info["data_end"] = combined_raw_data_df.index.max()
+    run_info["timings"]["fetch_seconds"] = round(time.perf_counter() - stage_start, 3)
+
     # =========================================================================
     # STAGE 2: LOAD DATA, RUN STRATEGY, AND SAVE SIGNALS
     # =========================================================================
-    logging.info(f"--- STAGE 2: Loading Data from DB and Generating Signals ---")
+    logging.info(f"--- STAGE 2: Loading Data and Generating Signals ---")
+    stage_start = time.perf_counter()
 
-    # Load all data back from the DB
+    # Load all data back from the candle store (or the DB)
     # This proves Stage 1 worked and decouples the logic
-    all_data_from_db = load_data_from_db(db_engine, config.RAW_DATA_TABLE_NAME)
+    candle_store = CandleStore(config.CANDLE_STORE_DIR, config.DATA_TIMEZONE) if config.USE_CANDLE_STORE else None
+    all_stocks_data_dict = load_via_candle_store(candle_store, combined_raw_data_df)
 
-    if all_data_from_db.empty:
-        logging.error("Failed to load data from database. Cannot run strategy. Exiting.")
-        return
+    if not all_stocks_data_dict:
+        all_data_from_db = load_data_from_db(db_engine, config.RAW_DATA_TABLE_NAME)
+
+        if all_data_from_db.empty:
+            logging.error("Failed to load data from database. Cannot run strategy. Exiting.")
+            return "failed"
+
+        # Re-create the dictionary structure needed for the backtester
+        all_stocks_data_dict = split_by_symbol(all_data_from_db)
+    session_indexes = build_session_indexes(all_stocks_data_dict)
 
-    # Re-create the dictionary structure needed for the backtester
-    # This groups the big DataFrame by 'Symbol'
-    all_stocks_data_dict = {}
-    for symbol, group_df in all_data_from_db.groupby('Symbol'):
-        # Drop the 'Symbol' column as the strategy functions don't need it
-        all_stocks_data_dict[symbol] = group_df.drop(columns=['Symbol'])
-
-    all_combined_signals = []
-
-    logging.info(f"Running strategy for {len(all_stocks_data_dict)} stocks...")
-    for stock_symbol, stock_df in all_stocks_data_dict.items():
-        try:
-            stock_signals = generate_signals(
-                df=stock_df,
-                stock_symbol=stock_symbol,
-                end_time_str=config.STRATEGY_END_TIME,
-                stop_loss_pct=config.STOP_LOSS_PCT,
-                take_profit_pct=config.TAKE_PROFIT_PCT
-            )
-
-            if stock_signals:
-                logging.info(f"Found {len(stock_signals)} signals for {stock_symbol}.")
-                all_combined_signals.extend(stock_signals)
-        except Exception as e:
-            logging.error(f"Error running strategy for {stock_symbol}: {e}", exc_info=True)
-
-    if not all_combined_signals:
+    all_combined_signals_df = generate_all_signals(all_stocks_data_dict, session_indexes)
+    if all_combined_signals_df.empty:
         logging.warning("No signals generated for any stock. Backtest will be skipped.")
-        all_combined_signals_df = pd.DataFrame()
-    else:
-        all_combined_signals_df = pd.DataFrame(all_combined_signals)
 
     # Save the generated signals to their own table
     logging.info(f"Total signals generated: {len(all_combined_signals_df)}")
-    save_results_to_db(all_combined_signals_df, db_engine, config.SIGNALS_TABLE_NAME)
+    if not save_results_to_db(all_combined_signals_df, db_engine, config.SIGNALS_TABLE_NAME, run_id):
+        logging.error("Failed to save signals. Marking run as failed.")
+        return "failed"
+
+    run_info["num_symbols"] = len(all_stocks_data_dict)
+    run_info["num_signals"] = len(all_combined_signals_df)
+    run_info["timings"]["signals_seconds"] = round(time.perf_counter() - stage_start, 3)
 
     # =========================================================================
     # STAGE 3: RUN BACKTEST AND SAVE RESULTS
     # =========================================================================
     if all_combined_signals_df.empty:
         logging.info("--- STAGE 3: Skipped Backtesting (No Signals) ---")
-        logging.info("Backtest run finished.")
-        return
+        run_info["num_trades"] = 0
+        return "completed"
 
     logging.info(f"--- STAGE 3: Running Backtest on {len(all_combined_signals_df)} Signals ---")
+    stage_start = time.perf_counter()
 
     backtest_results_df = backtest_strategy_combined(
         all_combined_signals_df,
-        all_stocks_data_dict
+        all_stocks_data_dict,
+        session_indexes
     )
 
     # 5. Summarize and Save Final Results
@@ -162,15 +165,21 @@ def main():
         logging.info(f"Overall Profit/Loss: {overall_profit_loss:.2f}")
 
         # Save the final backtest results
-        save_results_to_db(
+        saved = save_results_to_db(
             df=backtest_results_df,
             engine=db_engine,
-            table_name=config.BACKTEST_TABLE_NAME
+            table_name=config.BACKTEST_TABLE_NAME,
+            run_id=run_id
         )
+        if not saved:
+            logging.error("Failed to save backtest results. Marking run as failed.")
+            return "failed"
     else:
         logging.warning("Backtest completed but produced no results.")
 
-    logging.info("Backtest run finished.")
+    run_info["num_trades"] = len(backtest_results_df)
+    run_info["timings"]["backtest_seconds"] = round(time.perf_counter() - stage_start, 3)
+    return "completed"
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,19 @@
 import pandas as pd
-from datetime import datetime
 import logging
 
-def backtest_strategy_combined(signals_df: pd.DataFrame, all_stocks_data: dict) -> pd.DataFrame:
+from src.session_calendar import build_session_index
+
+def backtest_strategy_combined(signals_df: pd.DataFrame, all_stocks_data: dict,
+                               session_indexes: dict = None) -> pd.DataFrame:
     """
     Backtests the trading strategy using combined signals across all stocks.
+    `session_indexes` maps symbol -> SessionIndex for its data; missing ones
+    are built once per symbol here.
     """
     trade_results = []
+    session_indexes = session_indexes or {}
+    # symbol -> (SessionIndex, high, low, close), built on a symbol's first signal
+    series_cache = {}
 
     if signals_df.empty:
         logging.warning("No trading signals generated. Skipping backtesting.")
@@ -34,8 +41,17 @@ def backtest_strategy_combined(signals_df: pd.DataFrame, all_stocks_data: dict)
             logging.warning(f"Signal timestamp {signal_timestamp} not found in data for {symbol}. Skipping.")
             continue
 
-        trade_date = signal_timestamp.date()
-        end_of_day = datetime.combine(trade_date, datetime.strptime('15:30', '%H:%M').time()).replace(tzinfo=signal_timestamp.tzinfo)
+        if symbol not in series_cache:
+            series_cache[symbol] = (
+                session_indexes.get(symbol) or build_session_index(df),
+                df['high'].to_numpy(),
+                df['low'].to_numpy(),
+                df['close'].to_numpy()
+            )
+        session_index, high, low, close = series_cache[symbol]
+
+        # Last candle at or before the session close on the signal's day
+        eod_loc = session_index.session_close_pos(signal_loc)
 
         trade_outcome = "Open"
         exit_price = None
@@ -44,48 +60,42 @@ def backtest_strategy_combined(signals_df: pd.DataFrame, all_stocks_data: dict)
 
         start_sim_loc = signal_loc + 1 # Start simulation from the *next* candle
 
-        for i in range(start_sim_loc, len(df)):
-            current_candle = df.iloc[i]
-            current_timestamp = df.index[i]
-
-            # 1. Check for End of Day
-            if current_timestamp > end_of_day:
-                trade_outcome = "Open (Closed EOD)"
-                # Exit at the close of the *last valid candle* of the day
-                eod_candles = df.loc[(df.index.date == trade_date) & (df.index <= end_of_day)]
-                if not eod_candles.empty:
-                    last_eod_candle = eod_candles.iloc[-1]
-                    exit_price = last_eod_candle['close']
-                    exit_timestamp = last_eod_candle.name
-                    profit_loss = entry_price - exit_price # Sell trade: Entry - Exit
-                else:
-                    # Fallback if something is wrong
-                    exit_price = df.iloc[signal_loc]['close']
-                    exit_timestamp = signal_timestamp
-                    profit_loss = entry_price - exit_price
-                    trade_outcome = "Open (Closed Signal Candle)"
-                break
-
-                # 2. Check for Stop Loss (Sell trade)
-            if current_candle['high'] >= stop_loss_price:
+        # Candles after eod_loc are past the session close, so only these can hit SL/TP
+        for i in range(start_sim_loc, eod_loc + 1):
+            # 1. Check for Stop Loss (Sell trade)
+            if high[i] >= stop_loss_price:
                 trade_outcome = "Loss"
                 exit_price = stop_loss_price # Exit at stop loss price
-                exit_timestamp = current_timestamp
+                exit_timestamp = df.index[i]
                 profit_loss = entry_price - exit_price
                 break
 
-                # 3. Check for Take Profit (Sell trade)
-            if current_candle['low'] <= take_profit_price:
+            # 2. Check for Take Profit (Sell trade)
+            if low[i] <= take_profit_price:
                 trade_outcome = "Win"
                 exit_price = take_profit_price # Exit at take profit price
-                exit_timestamp = current_timestamp
+                exit_timestamp = df.index[i]
                 profit_loss = entry_price - exit_price
                 break
 
-                # If loop finishes without exit, it's an open trade closed at last available data
+        if trade_outcome == "Open" and max(start_sim_loc, eod_loc + 1) < len(df):
+            # 3. End of Day: data continues past the close, so exit at the close
+            # of the *last valid candle* of the day
+            trade_outcome = "Open (Closed EOD)"
+            if eod_loc >= 0:
+                exit_price = close[eod_loc]
+                exit_timestamp = df.index[eod_loc]
+                profit_loss = entry_price - exit_price # Sell trade: Entry - Exit
+            else:
+                # Fallback if something is wrong
+                exit_price = close[signal_loc]
+                exit_timestamp = signal_timestamp
+                profit_loss = entry_price - exit_price
+                trade_outcome = "Open (Closed Signal Candle)"
+
+        # If no exit was found, it's an open trade closed at last available data
         if trade_outcome == "Open":
-            last_candle = df.iloc[-1]
-            exit_price = last_candle['close']
+            exit_price = close[-1]
             exit_timestamp = df.index[-1]
             profit_loss = entry_price - exit_price
             trade_outcome = "Open (Closed Last Data)"
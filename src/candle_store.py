@@ -0,0 +1,213 @@
+import os
+import struct
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# On-disk layout: <root>/<SYMBOL>/<YYYY-MM>.candles, one file per symbol per month.
+# Each file is a 64-byte header followed by one contiguous block per column, all
+# 8 bytes wide, so column k of an n-row file starts at HEADER_SIZE + k * n * 8.
+# Timestamps are int64 nanoseconds since the epoch (UTC), sorted ascending.
+MAGIC = b'CNDL'
+VERSION = 1
+HEADER_SIZE = 64
+HEADER_FORMAT = '<4sIQ'  # magic, version, row count
+FILE_SUFFIX = '.candles'
+
+# Each cached memmap holds an open file descriptor, so only the most recently
+# used month files stay mapped. Evicted files are re-mapped on their next read.
+MAX_OPEN_MAPS = 64
+
+COLUMNS = [
+    ('timestamp', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.int64),
+    ('open_interest', np.float64),
+]
+DATA_COLUMNS = [name for name, _ in COLUMNS[1:]]
+
+class CandleStore:
+    """
+    Local, memory-mapped columnar cache of candle data (MySQL stays the system of record).
+
+    Files are opened with np.memmap, so a read only pages in the rows of the
+    requested window, and parallel processes reading the same files share
+    the OS page cache. A window that falls within one month file is returned
+    without copying; windows spanning months are concatenated.
+    """
+
+    def __init__(self, root: str, tz: str, max_open_maps: int = MAX_OPEN_MAPS):
+        self.root = root
+        self.tz = tz
+        self.max_open_maps = max_open_maps
+        self._maps = OrderedDict()  # path -> (inode, mtime_ns, row count, memmap), least recently used first
+        self._maps_lock = threading.Lock()
+
+    # ------------- Paths -------------
+    def _symbol_dir(self, symbol: str) -> str:
+        return os.path.join(self.root, symbol)
+
+    def _month_path(self, symbol: str, month: str) -> str:
+        return os.path.join(self._symbol_dir(symbol), f"{month}{FILE_SUFFIX}")
+
+    def symbols(self) -> list:
+        """Returns the symbols that have at least one month on disk."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isdir(self._symbol_dir(name)))
+
+    def months(self, symbol: str) -> list:
+        """Returns the months ('YYYY-MM') stored for a symbol, oldest first."""
+        symbol_dir = self._symbol_dir(symbol)
+        if not os.path.isdir(symbol_dir):
+            return []
+        return sorted(name[:-len(FILE_SUFFIX)] for name in os.listdir(symbol_dir)
+                      if name.endswith(FILE_SUFFIX))
+
+    # ------------- Reading -------------
+    def _open(self, path: str) -> tuple:
+        """
+        Returns (row count, {column: array}) for a month file; the arrays are views
+        into a cached read-only memmap. A file replaced by a write is re-mapped.
+        Beyond `max_open_maps` files, the least recently used map is dropped; its
+        descriptor closes once no returned DataFrame still views it.
+        """
+        stat = os.stat(path)
+        with self._maps_lock:
+            cached = self._maps.get(path)
+            if cached is None or cached[:2] != (stat.st_ino, stat.st_mtime_ns):
+                mm = np.memmap(path, dtype=np.uint8, mode='r')
+                magic, version, n = struct.unpack_from(HEADER_FORMAT, mm, 0)
+                if magic != MAGIC or version != VERSION:
+                    raise ValueError(f"Not a version {VERSION} candle file: {path}")
+                cached = (stat.st_ino, stat.st_mtime_ns, n, mm)
+                self._maps[path] = cached
+                while len(self._maps) > self.max_open_maps:
+                    self._maps.popitem(last=False)
+            self._maps.move_to_end(path)
+
+        n, mm = cached[2], cached[3]
+        columns = {}
+        for k, (name, dtype) in enumerate(COLUMNS):
+            offset = HEADER_SIZE + k * n * 8
+            columns[name] = mm[offset:offset + n * 8].view(dtype)
+        return n, columns
+
+    def _to_ns(self, value) -> int:
+        ts = pd.Timestamp(value)
+        if ts.tzinfo is None:
+            ts = ts.tz_localize(self.tz)
+        return ts.value
+
+    def _month_key(self, value) -> str:
+        ts = pd.Timestamp(value)
+        if ts.tzinfo is not None:
+            ts = ts.tz_convert(self.tz)
+        return ts.strftime('%Y-%m')
+
+    def read(self, symbol: str, start=None, end=None) -> pd.DataFrame:
+        """
+        Returns a symbol's candles with start <= timestamp <= end (both optional,
+        naive values are taken as exchange-local time), indexed by 'timestamp'
+        like load_data_from_db. Only the month files overlapping the window are opened.
+        """
+        start_ns = self._to_ns(start) if start is not None else None
+        end_ns = self._to_ns(end) if end is not None else None
+        first_month = self._month_key(start) if start is not None else None
+        last_month = self._month_key(end) if end is not None else None
+
+        pieces = []
+        for month in self.months(symbol):
+            if (first_month and month < first_month) or (last_month and month > last_month):
+                continue
+            n, columns = self._open(self._month_path(symbol, month))
+            ts = columns['timestamp']
+            lo = np.searchsorted(ts, start_ns, side='left') if start_ns is not None else 0
+            hi = np.searchsorted(ts, end_ns, side='right') if end_ns is not None else n
+            if hi > lo:
+                pieces.append({name: arr[lo:hi] for name, arr in columns.items()})
+
+        if not pieces:
+            return pd.DataFrame(columns=DATA_COLUMNS, index=pd.DatetimeIndex([], name='timestamp', tz=self.tz))
+
+        if len(pieces) == 1:
+            window = pieces[0]
+        else:
+            window = {name: np.concatenate([piece[name] for piece in pieces]) for name, _ in COLUMNS}
+
+        index = pd.DatetimeIndex(window['timestamp'].view('datetime64[ns]'), name='timestamp') \
+            .tz_localize('UTC').tz_convert(self.tz)
+        return pd.DataFrame({name: window[name] for name in DATA_COLUMNS}, index=index, copy=False)
+
+    def read_many(self, symbols: list = None, start=None, end=None) -> dict:
+        """Returns {symbol: DataFrame} for `symbols` (default: all), skipping symbols with no rows."""
+        data = {}
+        for symbol in (symbols if symbols is not None else self.symbols()):
+            df = self.read(symbol, start, end)
+            if not df.empty:
+                data[symbol] = df
+        return data
+
+    # ------------- Writing -------------
+    def write(self, symbol: str, df: pd.DataFrame):
+        """
+        Merges a symbol's candles into its month files. Rows already on disk with
+        the same timestamp are replaced by the new ones. Each file is rewritten
+        atomically (temp file + os.replace), so concurrent readers keep a
+        consistent view of the old file until they re-open it.
+        """
+        if df.empty:
+            return
+
+        index = df.index if df.index.tz is not None else df.index.tz_localize(self.tz)
+        df = df.reindex(columns=DATA_COLUMNS).set_axis(index.tz_convert(self.tz).rename('timestamp'))
+        local_months = df.index.strftime('%Y-%m')
+
+        os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+        for month in pd.unique(local_months):
+            new_rows = df[local_months == month]
+            path = self._month_path(symbol, month)
+            if os.path.exists(path):
+                existing = self.read(symbol, *self._month_bounds(month))
+                new_rows = pd.concat([existing, new_rows])
+                new_rows = new_rows[~new_rows.index.duplicated(keep='last')]
+            self._write_file(path, new_rows.sort_index())
+
+    def write_combined(self, combined_df: pd.DataFrame):
+        """Writes a combined DataFrame with a 'Symbol' column (the shape saved to MySQL)."""
+        for symbol, group_df in combined_df.groupby('Symbol'):
+            self.write(symbol, group_df.drop(columns=['Symbol']))
+        logging.info(f"Wrote {len(combined_df)} candles to the candle store at {self.root}.")
+
+    def _month_bounds(self, month: str) -> tuple:
+        start = pd.Timestamp(f"{month}-01").tz_localize(self.tz)
+        end = start + pd.offsets.MonthBegin(1) - pd.Timedelta(1, 'ns')
+        return start, end
+
+    def _write_file(self, path: str, df: pd.DataFrame):
+        """Writes one month file; `df` has a tz-aware index and all DATA_COLUMNS."""
+        n = len(df)
+        arrays = {
+            'timestamp': df.index.tz_convert('UTC').tz_localize(None).as_unit('ns').asi8,
+            'volume': pd.to_numeric(df['volume'], errors='coerce').fillna(0).to_numpy(dtype=np.int64),
+        }
+        for name in ('open', 'high', 'low', 'close', 'open_interest'):
+            arrays[name] = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, n).ljust(HEADER_SIZE, b'\0'))
+                for name, dtype in COLUMNS:
+                    f.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
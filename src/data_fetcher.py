@@ -1,11 +1,14 @@
+import logging
 import pandas as pd
 import upstox_client
-from datetime import datetime, timedelta
+from datetime import datetime
 try:
     from zoneinfo import ZoneInfo  # Python 3.9+
 except ImportError:
     from backports.zoneinfo import ZoneInfo  # if needed
 
+from src.session_calendar import SessionCalendar, get_session_calendar
+
 # ------------- API Client Setup -------------
 def get_api_client(access_token: str) -> upstox_client.HistoryV3Api:
     """Configures and returns the Upstox History API client."""
@@ -59,40 +62,49 @@ def fetch_intraday_df(api, instrument_key, unit="minutes", interval="1"):
     resp = api.get_intra_day_candle_data(instrument_key, unit, interval)
     return candles_to_df(_extract_candles(resp))
 
-# ------------- Main: combine Historical (till yesterday) + Intraday (today) -------------
+# ------------- Main: combine Historical (till last session) + Intraday (today) -------------
 def get_continuous_candles(api: upstox_client.HistoryV3Api,
                            instrument_key: str,
                            unit: str,
                            interval: str,
                            from_date: str,
-                           tz: str) -> pd.DataFrame:
+                           tz: str,
+                           calendar: SessionCalendar = None) -> pd.DataFrame:
     """
     Returns a single, continuous DataFrame of candles from `from_date` up to 'now',
-    by stitching Historical V3 (<= yesterday) with Intraday V3 (today).
+    by stitching Historical V3 (<= previous trading day) with Intraday V3 (today).
+    Uses the NSE session calendar to skip API calls that can only return nothing:
+    a historical window with no trading days, or intraday before today's session opens.
     """
-    today = datetime.now(ZoneInfo(tz)).date()
-    yday = today - timedelta(days=1)
+    calendar = calendar or get_session_calendar()
+    now = datetime.now(ZoneInfo(tz))
+    today = now.date()
+    last_session = calendar.previous_trading_day(today)
 
     frames = []
 
-    # 1) Historical up to yesterday (only if the window is valid)
-    start = datetime.fromisoformat(from_date).date()
-    if start <= yday:
+    # 1) Historical up to the previous trading day (only if the window has trading days)
+    start = calendar.next_trading_day(datetime.fromisoformat(from_date).date())
+    if start <= last_session:
         df_hist = fetch_historical_df(
             api,
             instrument_key=instrument_key,
             unit=unit,
             interval=interval,
             from_date=start.isoformat(),
-            to_date=yday.isoformat()
+            to_date=last_session.isoformat()
         )
         frames.append(df_hist)
 
-    # 2) Intraday for today
-    df_id = fetch_intraday_df(api, instrument_key, unit=unit, interval=interval)
-    if not df_id.empty:
-        df_id = df_id.loc[df_id.index.date == today]  # keep only today's rows
-        frames.append(df_id)
+    # 2) Intraday for today, if today's session has started
+    session = calendar.session_times(today)
+    if session is not None and now.time() >= session[0]:
+        df_id = fetch_intraday_df(api, instrument_key, unit=unit, interval=interval)
+        if not df_id.empty:
+            df_id = df_id.loc[df_id.index.date == today]  # keep only today's rows
+            frames.append(df_id)
+    else:
+        logging.debug(f"Skipping intraday fetch for {instrument_key}: no session in progress on {today}.")
 
     # 3) Concatenate, sort, and de-duplicate (prefer later rows -> intraday overwrites)
     if frames:
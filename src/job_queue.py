@@ -0,0 +1,251 @@
+import json
+import logging
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import text
+
+# The queue relies on MySQL 8 features (FOR UPDATE SKIP LOCKED),
+# which is what docker-compose.yml runs.
+
+def ensure_jobs_table(engine, jobs_table: str):
+    """Creates the job-queue table if it does not exist yet."""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {jobs_table} (
+                job_id INTEGER NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                run_id VARCHAR(32) NOT NULL,
+                batch_no INTEGER NOT NULL,
+                symbols TEXT NOT NULL,
+                status VARCHAR(16) NOT NULL,
+                worker_id VARCHAR(128),
+                attempts INTEGER NOT NULL DEFAULT 0,
+                heartbeat_at DATETIME,
+                created_at DATETIME,
+                finished_at DATETIME,
+                error TEXT,
+                data_start DATETIME,
+                data_end DATETIME,
+                num_symbols INTEGER,
+                num_signals INTEGER,
+                num_trades INTEGER,
+                fetch_seconds DOUBLE,
+                signals_seconds DOUBLE,
+                backtest_seconds DOUBLE,
+                INDEX idx_{jobs_table}_status (status, job_id),
+                INDEX idx_{jobs_table}_run (run_id, status)
+            )
+        """))
+
+def enqueue_run(engine, jobs_table: str, run_id: str, stocks_df: pd.DataFrame, batch_size: int) -> int:
+    """
+    Splits the stock list into batches of `batch_size` symbols and queues one
+    'pending' job per batch for `run_id`. Returns the number of jobs queued.
+    """
+    stocks = stocks_df[['Symbol', 'ISIN Code']].to_dict(orient='records')
+    jobs = [
+        {"run_id": run_id, "batch_no": batch_no, "symbols": json.dumps(stocks[start:start + batch_size])}
+        for batch_no, start in enumerate(range(0, len(stocks), batch_size))
+    ]
+    if not jobs:
+        return 0
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"INSERT INTO {jobs_table} (run_id, batch_no, symbols, status, created_at) "
+                 f"VALUES (:run_id, :batch_no, :symbols, 'pending', NOW())"),
+            jobs
+        )
+    logging.info(f"Queued {len(jobs)} jobs ({len(stocks)} symbols) for run {run_id}.")
+    return len(jobs)
+
+def claim_job(engine, jobs_table: str, runs_table: str, worker_id: str,
+              stale_seconds: int, max_attempts: int, run_timeout_seconds: int):
+    """
+    Claims the oldest available job for `worker_id`, or returns None if there is none.
+
+    A job is available when it is pending, or running with a heartbeat older than
+    `stale_seconds` (its worker died). Jobs whose run is no longer 'running', or
+    that are older than `run_timeout_seconds`, are skipped. SKIP LOCKED lets many
+    workers claim concurrently without blocking on, or double-claiming, the same row.
+    The claimed job carries its run's params (data window and strategy settings).
+    """
+    with engine.begin() as conn:
+        row = conn.execute(
+            text(f"SELECT j.job_id, j.run_id, j.batch_no, j.symbols, j.attempts, r.params "
+                 f"FROM {jobs_table} j JOIN {runs_table} r ON r.run_id = j.run_id "
+                 f"WHERE r.status = 'running' "
+                 f"AND j.created_at > NOW() - INTERVAL :run_timeout_seconds SECOND "
+                 f"AND j.attempts < :max_attempts "
+                 f"AND (j.status = 'pending' "
+                 f"OR (j.status = 'running' AND j.heartbeat_at < NOW() - INTERVAL :stale_seconds SECOND)) "
+                 f"ORDER BY j.job_id LIMIT 1 FOR UPDATE OF j SKIP LOCKED"),
+            {"max_attempts": max_attempts, "stale_seconds": stale_seconds,
+             "run_timeout_seconds": run_timeout_seconds}
+        ).first()
+
+        if row is None:
+            return None
+
+        conn.execute(
+            text(f"UPDATE {jobs_table} SET status = 'running', worker_id = :worker_id, "
+                 f"attempts = attempts + 1, heartbeat_at = NOW() WHERE job_id = :job_id"),
+            {"worker_id": worker_id, "job_id": row.job_id}
+        )
+
+    return {
+        "job_id": row.job_id,
+        "run_id": row.run_id,
+        "batch_no": row.batch_no,
+        "symbols": json.loads(row.symbols),
+        "attempt": row.attempts + 1,
+        # The run's data window and strategy settings, so every worker uses the same ones
+        "params": json.loads(row.params) if row.params else None,
+    }
+
+def heartbeat(engine, jobs_table: str, job_id: int, worker_id: str) -> bool:
+    """Refreshes a claim. Returns False if the job has been re-claimed by another worker."""
+    with engine.begin() as conn:
+        updated = conn.execute(
+            text(f"UPDATE {jobs_table} SET heartbeat_at = NOW() "
+                 f"WHERE job_id = :job_id AND worker_id = :worker_id AND status = 'running'"),
+            {"job_id": job_id, "worker_id": worker_id}
+        ).rowcount
+    return updated > 0
+
+def lock_owned_job(conn, jobs_table: str, job_id: int, worker_id: str) -> bool:
+    """
+    Locks a job's row (SELECT ... FOR UPDATE) for the rest of the caller's
+    transaction, if `worker_id` still holds the claim on it. While the lock is
+    held, the job can't be re-claimed, reaped or cancelled. Returns False if
+    the claim was lost.
+    """
+    row = conn.execute(
+        text(f"SELECT 1 FROM {jobs_table} "
+             f"WHERE job_id = :job_id AND worker_id = :worker_id AND status = 'running' FOR UPDATE"),
+        {"job_id": job_id, "worker_id": worker_id}
+    ).first()
+    return row is not None
+
+def complete_job(engine, jobs_table: str, job_id: int, worker_id: str, stats: dict) -> bool:
+    """
+    Marks a job as done and stores its batch statistics
+    (data_start, data_end, num_symbols, num_signals, num_trades, *_seconds).
+    """
+    data_start = stats.get("data_start")
+    data_end = stats.get("data_end")
+    with engine.begin() as conn:
+        updated = conn.execute(
+            text(f"UPDATE {jobs_table} SET status = 'done', finished_at = NOW(), error = NULL, "
+                 f"data_start = :data_start, data_end = :data_end, num_symbols = :num_symbols, "
+                 f"num_signals = :num_signals, num_trades = :num_trades, "
+                 f"fetch_seconds = :fetch_seconds, signals_seconds = :signals_seconds, "
+                 f"backtest_seconds = :backtest_seconds "
+                 f"WHERE job_id = :job_id AND worker_id = :worker_id AND status = 'running'"),
+            {
+                "job_id": job_id,
+                "worker_id": worker_id,
+                # Store the window as naive exchange-local time (DATETIME has no tz)
+                "data_start": data_start.replace(tzinfo=None) if data_start is not None else None,
+                "data_end": data_end.replace(tzinfo=None) if data_end is not None else None,
+                "num_symbols": stats.get("num_symbols", 0),
+                "num_signals": stats.get("num_signals", 0),
+                "num_trades": stats.get("num_trades", 0),
+                "fetch_seconds": stats.get("fetch_seconds"),
+                "signals_seconds": stats.get("signals_seconds"),
+                "backtest_seconds": stats.get("backtest_seconds"),
+            }
+        ).rowcount
+    return updated > 0
+
+def fail_job(engine, jobs_table: str, job_id: int, worker_id: str, error: str, max_attempts: int):
+    """
+    Releases a job after an error: it goes back to 'pending' for another worker,
+    or to 'failed' once it has used up `max_attempts`.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"UPDATE {jobs_table} SET error = :error, worker_id = NULL, "
+                 f"status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending' END "
+                 f"WHERE job_id = :job_id AND worker_id = :worker_id AND status = 'running'"),
+            {"job_id": job_id, "worker_id": worker_id, "error": error[:2000], "max_attempts": max_attempts}
+        )
+
+def reap_stale_jobs(engine, jobs_table: str, run_id: str, stale_seconds: int, max_attempts: int) -> int:
+    """
+    Marks running jobs of `run_id` as failed when their worker stopped
+    heartbeating and no retries are left (claim_job will never pick them up again).
+    Returns the number of jobs reaped.
+    """
+    with engine.begin() as conn:
+        reaped = conn.execute(
+            text(f"UPDATE {jobs_table} SET status = 'failed', "
+                 f"error = 'Worker stopped heartbeating and no attempts are left.' "
+                 f"WHERE run_id = :run_id AND status = 'running' AND attempts >= :max_attempts "
+                 f"AND heartbeat_at < NOW() - INTERVAL :stale_seconds SECOND"),
+            {"run_id": run_id, "max_attempts": max_attempts, "stale_seconds": stale_seconds}
+        ).rowcount
+    if reaped:
+        logging.warning(f"Marked {reaped} stale jobs of run {run_id} as failed.")
+    return reaped
+
+def cancel_run_jobs(engine, jobs_table: str, run_id: str, reason: str) -> int:
+    """
+    Marks every pending or running job of `run_id` as failed. A worker still busy
+    with one of them loses its claim and discards its results.
+    Returns the number of jobs cancelled.
+    """
+    with engine.begin() as conn:
+        cancelled = conn.execute(
+            text(f"UPDATE {jobs_table} SET status = 'failed', error = :reason "
+                 f"WHERE run_id = :run_id AND status IN ('pending', 'running')"),
+            {"run_id": run_id, "reason": reason}
+        ).rowcount
+    if cancelled:
+        logging.warning(f"Cancelled {cancelled} jobs of run {run_id}: {reason}")
+    return cancelled
+
+def expire_abandoned_runs(engine, runs_table: str, jobs_table: str, timeout_seconds: int) -> int:
+    """
+    Fails runs still marked 'running' after `timeout_seconds` (their coordinator
+    died) and cancels their leftover jobs. Returns the number of runs expired.
+    """
+    # started_at is written from the application clock, so compare against it too
+    cutoff = datetime.now() - timedelta(seconds=timeout_seconds)
+    with engine.connect() as conn:
+        run_ids = [row.run_id for row in conn.execute(
+            text(f"SELECT run_id FROM {runs_table} WHERE status = 'running' AND started_at < :cutoff"),
+            {"cutoff": cutoff}
+        )]
+
+    for run_id in run_ids:
+        cancel_run_jobs(engine, jobs_table, run_id, "Run was abandoned by its coordinator.")
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"UPDATE {runs_table} SET status = 'failed', finished_at = :finished_at "
+                     f"WHERE run_id = :run_id AND status = 'running'"),
+                {"run_id": run_id, "finished_at": datetime.now()}
+            )
+        logging.warning(f"Run {run_id} exceeded {timeout_seconds}s without finishing. Marked as failed.")
+    return len(run_ids)
+
+def get_run_progress(engine, jobs_table: str, run_id: str) -> dict:
+    """Returns {status: job_count} for a run."""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(f"SELECT status, COUNT(*) AS jobs FROM {jobs_table} WHERE run_id = :run_id GROUP BY status"),
+            {"run_id": run_id}
+        )
+        return {row.status: row.jobs for row in result}
+
+def get_run_totals(engine, jobs_table: str, run_id: str) -> dict:
+    """Aggregates the statistics of a run's completed jobs in SQL."""
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(f"SELECT MIN(data_start) AS data_start, MAX(data_end) AS data_end, "
+                 f"SUM(num_symbols) AS num_symbols, SUM(num_signals) AS num_signals, "
+                 f"SUM(num_trades) AS num_trades, SUM(fetch_seconds) AS fetch_seconds, "
+                 f"SUM(signals_seconds) AS signals_seconds, SUM(backtest_seconds) AS backtest_seconds "
+                 f"FROM {jobs_table} WHERE run_id = :run_id AND status = 'done'"),
+            {"run_id": run_id}
+        ).first()
+    return dict(row._mapping)
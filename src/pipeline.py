@@ -0,0 +1,137 @@
+import logging
+import pandas as pd
+
+import config
+from src.data_fetcher import get_continuous_candles
+from src.strategy import generate_signals
+from src.session_calendar import build_session_index
+
+def current_settings() -> dict:
+    """
+    Returns the data window and strategy settings from config. A run records
+    them in its params, and workers use the recorded values rather than their
+    own config (DATA_START_DATE is fixed when a long-lived worker imports config).
+    """
+    return {
+        "strategy_end_time": config.STRATEGY_END_TIME,
+        "stop_loss_pct": config.STOP_LOSS_PCT,
+        "take_profit_pct": config.TAKE_PROFIT_PCT,
+        "data_start_date": config.DATA_START_DATE,
+        "data_interval_unit": config.DATA_INTERVAL_UNIT,
+        "data_interval_value": config.DATA_INTERVAL_VALUE,
+        "data_timezone": config.DATA_TIMEZONE,
+    }
+
+def build_run_params(num_stocks: int, **extra) -> dict:
+    """Returns the parameters recorded in the runs table for a run."""
+    params = current_settings()
+    params["stocks_csv_path"] = config.STOCKS_CSV_PATH
+    params["num_stocks"] = num_stocks
+    params.update(extra)
+    return params
+
+def fetch_all_stocks(api, stocks_df: pd.DataFrame, settings: dict = None) -> pd.DataFrame:
+    """
+    Fetches candles for every stock in `stocks_df` (columns 'Symbol' and 'ISIN Code').
+    Returns one combined DataFrame with a 'Symbol' column, or an empty DataFrame.
+    `settings` (see current_settings) defaults to the current config.
+    """
+    settings = settings or current_settings()
+    all_stocks_data_frames = [] # To store individual DFs before combining
+
+    for index, row in stocks_df.iterrows():
+        stock_symbol = row['Symbol']
+        instrument_key = f"NSE_EQ|{row['ISIN Code']}"
+        logging.info(f"Fetching: {stock_symbol} ({instrument_key})")
+
+        try:
+            df_5m = get_continuous_candles(
+                api=api,
+                instrument_key=instrument_key,
+                unit=settings["data_interval_unit"],
+                interval=settings["data_interval_value"],
+                from_date=settings["data_start_date"],
+                tz=settings["data_timezone"]
+            )
+
+            if not df_5m.empty:
+                # IMPORTANT: Add the symbol to the dataframe
+                df_5m['Symbol'] = stock_symbol
+                all_stocks_data_frames.append(df_5m)
+            else:
+                logging.warning(f"No data fetched for {stock_symbol}.")
+
+        except Exception as e:
+            logging.error(f"Error fetching data for {stock_symbol}: {e}", exc_info=True)
+
+    if not all_stocks_data_frames:
+        return pd.DataFrame()
+
+    # Combine all individual dataframes into one large one
+    return pd.concat(all_stocks_data_frames)
+
+def split_by_symbol(combined_df: pd.DataFrame) -> dict:
+    """
+    Re-creates the {symbol: DataFrame} structure needed by the strategy and backtester.
+    The 'Symbol' column is dropped as the strategy functions don't need it.
+    """
+    return {symbol: group_df.drop(columns=['Symbol'])
+            for symbol, group_df in combined_df.groupby('Symbol')}
+
+def load_via_candle_store(candle_store, combined_df: pd.DataFrame, settings: dict = None) -> dict:
+    """
+    Writes freshly fetched candles to the CandleStore and reads them back with
+    CandleStore.read_many, so the strategy and backtester run on memory-mapped
+    pages that parallel processes share through the OS page cache.
+    Returns {} if there is no store or it fails; callers then fall back to their own copy.
+    """
+    if candle_store is None or combined_df.empty:
+        return {}
+    settings = settings or current_settings()
+    try:
+        candle_store.write_combined(combined_df)
+        return candle_store.read_many(
+            symbols=list(combined_df['Symbol'].unique()),
+            start=settings["data_start_date"]
+        )
+    except Exception as e:
+        logging.error(f"Candle store failed, using the data in memory instead: {e}", exc_info=True)
+        return {}
+
+def build_session_indexes(all_stocks_data_dict: dict, settings: dict = None) -> dict:
+    """
+    Precomputes each stock's day boundaries (with the strategy end time as cutoff)
+    once, so the strategy and backtester share them.
+    """
+    settings = settings or current_settings()
+    return {symbol: build_session_index(stock_df, settings["strategy_end_time"])
+            for symbol, stock_df in all_stocks_data_dict.items()}
+
+def generate_all_signals(all_stocks_data_dict: dict, session_indexes: dict = None,
+                         settings: dict = None) -> pd.DataFrame:
+    """Runs the strategy for every stock and returns all signals as one DataFrame."""
+    settings = settings or current_settings()
+    all_combined_signals = []
+    session_indexes = session_indexes or {}
+
+    logging.info(f"Running strategy for {len(all_stocks_data_dict)} stocks...")
+    for stock_symbol, stock_df in all_stocks_data_dict.items():
+        try:
+            stock_signals = generate_signals(
+                df=stock_df,
+                stock_symbol=stock_symbol,
+                end_time_str=settings["strategy_end_time"],
+                stop_loss_pct=settings["stop_loss_pct"],
+                take_profit_pct=settings["take_profit_pct"],
+                session_index=session_indexes.get(stock_symbol)
+            )
+
+            if stock_signals:
+                logging.info(f"Found {len(stock_signals)} signals for {stock_symbol}.")
+                all_combined_signals.extend(stock_signals)
+        except Exception as e:
+            logging.error(f"Error running strategy for {stock_symbol}: {e}", exc_info=True)
+
+    if not all_combined_signals:
+        return pd.DataFrame()
+    return pd.DataFrame(all_combined_signals)
@@ -0,0 +1,160 @@
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import inspect, text
+
+# Columns that make up the keyset used to page through signals and trades.
+# They match the (run_id, Symbol, Signal_Timestamp) index created by save_results_to_db.
+_PAGE_KEY = ("Symbol", "Signal_Timestamp")
+
+def _table_exists(engine, table_name: str) -> bool:
+    """
+    Results tables are created by the first non-empty save, so on a fresh
+    database a finished run may have no signals or trades table yet.
+    """
+    return inspect(engine).has_table(table_name)
+
+def _to_json_value(value):
+    """Converts DB values into something jsonify can render consistently."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _row_to_dict(row) -> dict:
+    return {key: _to_json_value(value) for key, value in row._mapping.items()}
+
+def _decode_run(row) -> dict:
+    """Turns a run-metadata row into a dict, expanding the JSON params/timings columns."""
+    run = _row_to_dict(row)
+    for col in ("params", "timings"):
+        if run.get(col):
+            run[col] = json.loads(run[col])
+    return run
+
+def encode_cursor(symbol: str, timestamp) -> str:
+    """Packs the last (Symbol, Signal_Timestamp) of a page into an opaque cursor string."""
+    raw = json.dumps([symbol, _to_json_value(timestamp)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        symbol, timestamp = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return symbol, timestamp
+
+def list_runs(engine, runs_table: str, limit: int, offset: int) -> list:
+    """Returns run-metadata rows, newest first."""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(f"SELECT * FROM {runs_table} ORDER BY started_at DESC LIMIT :limit OFFSET :offset"),
+            {"limit": limit, "offset": offset}
+        )
+        return [_decode_run(row) for row in result]
+
+def get_run(engine, runs_table: str, run_id: str):
+    """Returns a single run-metadata row as a dict, or None if the run is unknown."""
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(f"SELECT * FROM {runs_table} WHERE run_id = :run_id"),
+            {"run_id": run_id}
+        ).first()
+
+    return _decode_run(row) if row is not None else None
+
+def fetch_results_page(engine, table_name: str, run_id: str, limit: int, cursor: str = None) -> tuple:
+    """
+    Returns one page of signals or trades for a run, ordered by (Symbol, Signal_Timestamp).
+
+    Uses keyset pagination on the run index, so each page is a bounded index
+    range scan no matter how deep into the results the client is.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if not _table_exists(engine, table_name):
+        return [], None
+
+    params = {"run_id": run_id, "limit": limit + 1}  # One extra row tells us if there's a next page
+    where = "run_id = :run_id"
+    if cursor:
+        after_symbol, after_timestamp = decode_cursor(cursor)
+        where += (" AND (Symbol > :after_symbol"
+                  " OR (Symbol = :after_symbol AND Signal_Timestamp > :after_timestamp))")
+        params["after_symbol"] = after_symbol
+        params["after_timestamp"] = after_timestamp
+
+    query = text(f"SELECT * FROM {table_name} WHERE {where} "
+                 f"ORDER BY {', '.join(_PAGE_KEY)} LIMIT :limit")
+    with engine.connect() as conn:
+        rows = [_row_to_dict(row) for row in conn.execute(query, params)]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["Symbol"], last["Signal_Timestamp"])
+    return rows, next_cursor
+
+def summarize_run(engine, signals_table: str, backtest_table: str, run_id: str) -> dict:
+    """
+    Computes a run's summary entirely in SQL: signal count, trade totals,
+    win rate, P&L, and a per-outcome breakdown. Only the run's index range is read.
+    A missing signals or backtest table counts as a run with no rows.
+    """
+    num_signals = 0
+    totals = {}
+    outcomes = {}
+    with engine.connect() as conn:
+        if _table_exists(engine, signals_table):
+            num_signals = conn.execute(
+                text(f"SELECT COUNT(*) FROM {signals_table} WHERE run_id = :run_id"),
+                {"run_id": run_id}
+            ).scalar()
+
+        if _table_exists(engine, backtest_table):
+            totals, outcomes = _summarize_trades(conn, backtest_table, run_id)
+
+    total_trades = totals.get("total_trades") or 0
+    wins = int(totals.get("wins") or 0)
+    return {
+        "run_id": run_id,
+        "num_signals": num_signals or 0,
+        "total_trades": total_trades,
+        "symbols_traded": totals.get("symbols_traded") or 0,
+        "wins": wins,
+        "losses": int(totals.get("losses") or 0),
+        "win_rate": (wins / total_trades) * 100 if total_trades > 0 else 0,
+        "total_profit_loss": _as_float(totals.get("total_profit_loss")),
+        "avg_profit_loss": _as_float(totals.get("avg_profit_loss")),
+        "best_trade": _as_float(totals.get("best_trade")),
+        "worst_trade": _as_float(totals.get("worst_trade")),
+        "by_outcome": outcomes,
+    }
+
+def _summarize_trades(conn, backtest_table: str, run_id: str) -> tuple:
+    """Returns (totals, {outcome: {trades, profit_loss}}) for a run's trades."""
+    totals = conn.execute(
+        text(f"SELECT COUNT(*) AS total_trades, "
+             f"COUNT(DISTINCT Symbol) AS symbols_traded, "
+             f"SUM(CASE WHEN Outcome = 'Win' THEN 1 ELSE 0 END) AS wins, "
+             f"SUM(CASE WHEN Outcome = 'Loss' THEN 1 ELSE 0 END) AS losses, "
+             f"SUM(Profit_Loss) AS total_profit_loss, "
+             f"AVG(Profit_Loss) AS avg_profit_loss, "
+             f"MAX(Profit_Loss) AS best_trade, "
+             f"MIN(Profit_Loss) AS worst_trade "
+             f"FROM {backtest_table} WHERE run_id = :run_id"),
+        {"run_id": run_id}
+    ).first()._mapping
+
+    by_outcome = conn.execute(
+        text(f"SELECT Outcome, COUNT(*) AS trades, SUM(Profit_Loss) AS profit_loss "
+             f"FROM {backtest_table} WHERE run_id = :run_id GROUP BY Outcome"),
+        {"run_id": run_id}
+    )
+    outcomes = {row.Outcome: {"trades": row.trades, "profit_loss": _as_float(row.profit_loss)}
+                for row in by_outcome}
+    return dict(totals), outcomes
+
+def _as_float(value):
+    """SUM/AVG come back as Decimal on MySQL; JSON wants plain floats."""
+    return float(value) if value is not None else None
@@ -0,0 +1,147 @@
+import os
+import logging
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# Regular NSE equity session (exchange-local time)
+REGULAR_OPEN = time(9, 15)
+REGULAR_CLOSE = time(15, 30)
+
+DEFAULT_CALENDAR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'nse_trading_calendar.csv')
+
+def _parse_time(value):
+    return datetime.strptime(value, '%H:%M').time()
+
+def _seconds_of_day(t: time) -> int:
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+class SessionCalendar:
+    """
+    NSE trading days and session times.
+    Weekdays trade REGULAR_OPEN-REGULAR_CLOSE unless listed as a holiday;
+    `special_sessions` ({date: (open, close)}) covers Muhurat trading,
+    weekend sessions and shortened days. Holidays are only known up to
+    `covered_through`; later dates fall back to weekdays-only, with a warning.
+    """
+
+    def __init__(self, holidays=(), special_sessions=None, covered_through: date = None):
+        self.holidays = set(holidays)
+        self.special_sessions = dict(special_sessions or {})
+        self.covered_through = covered_through
+        self._warned_uncovered = False
+
+    def _check_coverage(self, day: date):
+        # Warn once per calendar; trading_days() and the fetcher ask about many dates
+        if self.covered_through is not None and day > self.covered_through and not self._warned_uncovered:
+            self._warned_uncovered = True
+            logging.warning(f"Session calendar only covers holidays through {self.covered_through}; "
+                            f"treating {day} and later weekdays as trading days. "
+                            f"Add the next year's NSE holidays to the calendar file.")
+
+    def is_trading_day(self, day: date) -> bool:
+        self._check_coverage(day)
+        if day in self.special_sessions:
+            return True
+        return day.weekday() < 5 and day not in self.holidays
+
+    def session_times(self, day: date):
+        """Returns (open, close) for a trading day, or None if the exchange is closed."""
+        if day in self.special_sessions:
+            return self.special_sessions[day]
+        if self.is_trading_day(day):
+            return REGULAR_OPEN, REGULAR_CLOSE
+        return None
+
+    def previous_trading_day(self, day: date) -> date:
+        """Returns the last trading day strictly before `day`."""
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def next_trading_day(self, day: date) -> date:
+        """Returns the first trading day on or after `day`."""
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+@lru_cache(maxsize=None)
+def get_session_calendar(csv_path: str = DEFAULT_CALENDAR_PATH) -> SessionCalendar:
+    """
+    Loads the holiday/special-session CSV once and returns the shared calendar.
+    Coverage runs through Dec 31 of the last year in the file.
+    Falls back to a weekends-only calendar if the file is missing.
+    """
+    try:
+        rows = pd.read_csv(csv_path, comment='#', dtype=str).fillna('')
+    except FileNotFoundError:
+        logging.warning(f"Session calendar not found at: {csv_path}. Only weekends will be treated as holidays.")
+        return SessionCalendar()
+
+    holidays = set()
+    special_sessions = {}
+    for row in rows.itertuples(index=False):
+        day = date.fromisoformat(row.Date)
+        if row.Type == 'holiday':
+            holidays.add(day)
+        elif row.Type == 'special':
+            special_sessions[day] = (_parse_time(row.Open), _parse_time(row.Close))
+        else:
+            logging.warning(f"Unknown session type '{row.Type}' for {row.Date} in {csv_path}. Ignoring.")
+
+    listed_days = holidays | set(special_sessions)
+    covered_through = date(max(listed_days).year, 12, 31) if listed_days else None
+    return SessionCalendar(holidays, special_sessions, covered_through)
+
+class SessionIndex:
+    """
+    Precomputed day boundaries for one candle series (a sorted DatetimeIndex),
+    so the strategy and backtester can look them up in O(1) by position.
+
+    Per row:
+        day_codes   - number of the row's day (index into the per-day arrays)
+        cutoff_mask - True if the candle is at or before the cutoff time
+    Per day:
+        close_pos   - position of the last row at or before the session close (-1 if none)
+    """
+
+    def __init__(self, index: pd.DatetimeIndex, calendar: SessionCalendar = None, cutoff: time = None):
+        calendar = calendar or get_session_calendar()
+
+        codes, uniques = pd.factorize(index.normalize())  # Sorted index -> codes are non-decreasing
+        self.day_codes = codes
+        day_numbers = np.arange(len(uniques))
+        day_start = np.searchsorted(codes, day_numbers, side='left')
+
+        # (day, seconds-of-day) folded into one sorted key, so "last row of day d at or
+        # before its close" is a single vectorized searchsorted over all days.
+        seconds = (index.hour * 3600 + index.minute * 60 + index.second).to_numpy()
+        day_key = codes.astype(np.int64) * 86400 + seconds
+
+        close_seconds = np.array([
+            _seconds_of_day((calendar.session_times(ts.date()) or (REGULAR_OPEN, REGULAR_CLOSE))[1])
+            for ts in uniques
+        ], dtype=np.int64)
+        self.close_pos = np.searchsorted(day_key, day_numbers * 86400 + close_seconds, side='right') - 1
+        self.close_pos[self.close_pos < day_start] = -1  # Nothing that early on that day
+
+        if cutoff is None:
+            self.cutoff_mask = np.ones(len(index), dtype=bool)
+        else:
+            self.cutoff_mask = seconds <= _seconds_of_day(cutoff)
+
+    def same_day(self, pos_a: int, pos_b: int) -> bool:
+        return self.day_codes[pos_a] == self.day_codes[pos_b]
+
+    def session_close_pos(self, pos: int) -> int:
+        """Returns the position of the last candle at or before the session close on row `pos`'s day."""
+        return self.close_pos[self.day_codes[pos]]
+
+def build_session_index(df: pd.DataFrame, end_time_str: str = None,
+                        calendar: SessionCalendar = None) -> SessionIndex:
+    """Builds the SessionIndex for a candle DataFrame, with an optional 'HH:MM' cutoff."""
+    cutoff = _parse_time(end_time_str) if end_time_str else None
+    return SessionIndex(df.index, calendar=calendar, cutoff=cutoff)
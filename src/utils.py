@@ -1,7 +1,11 @@
+import json
 import logging
 import sys
+import uuid
+from datetime import datetime
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import Column, MetaData, Table, bindparam, create_engine, inspect, text
+from sqlalchemy.types import BigInteger, DateTime, Float, String, Text
 
 def setup_logging():
     """Configures a basic logger."""
@@ -33,13 +37,15 @@ def get_db_engine(db_url: str):
         logging.error(f"Failed to create database engine: {e}")
         return None
 
-def save_candle_data_to_db(df: pd.DataFrame, engine, table_name: str):
+def save_candle_data_to_db(df: pd.DataFrame, engine, table_name: str, if_exists: str = 'replace') -> bool:
     """
     Saves the combined raw candle data DataFrame to the database.
     This function will RESET the index to save 'timestamp' as a column.
+    Workers pass if_exists='append' so batches don't overwrite each other.
+    Returns False if the rows could not be saved.
     """
     if engine is None:
-        return
+        return False
 
     try:
         # Reset index to make 'timestamp' a regular column for SQL
@@ -52,19 +58,25 @@ def save_candle_data_to_db(df: pd.DataFrame, engine, table_name: str):
 
         logging.info(f"Saving {len(df_to_save)} rows of candle data to table: {table_name}...")
 
-        # Use if_exists='replace' to do a full refresh every time.
-        df_to_save.to_sql(table_name, con=engine, if_exists='replace', index=False)
+        # Default if_exists='replace' does a full refresh every time.
+        df_to_save.to_sql(table_name, con=engine, if_exists=if_exists, index=False)
 
         logging.info(f"Successfully saved raw candle data to {table_name}.")
 
-        # Optional: Add an index on Symbol and timestamp for faster queries
+    except Exception as e:
+        logging.error(f"Failed to save raw candle data to database: {e}")
+        return False
+
+    # Optional: Add an index on Symbol and timestamp for faster queries.
+    # The rows are already saved, so a failure here doesn't fail the save.
+    try:
         with engine.connect() as conn:
             conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_symbol_timestamp ON {table_name} (Symbol, timestamp)"))
             conn.commit()
         logging.info("Database index created on (Symbol, timestamp).")
-
     except Exception as e:
-        logging.error(f"Failed to save raw candle data to database: {e}")
+        logging.warning(f"Could not create (Symbol, timestamp) index on {table_name}: {e}")
+    return True
 
 def load_data_from_db(engine, table_name: str) -> pd.DataFrame:
     """
@@ -93,19 +105,227 @@ def load_data_from_db(engine, table_name: str) -> pd.DataFrame:
         logging.error(f"Failed to load raw data from database: {e}")
         return pd.DataFrame()
 
-def save_results_to_db(df: pd.DataFrame, engine, table_name: str):
+def generate_run_id() -> str:
+    """Returns a new, sortable run identifier, e.g. '20250101093000_1a2b3c4d'."""
+    return f"{datetime.now():%Y%m%d%H%M%S}_{uuid.uuid4().hex[:8]}"
+
+def ensure_runs_table(engine, runs_table: str):
+    """Creates the run-metadata table if it does not exist yet."""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {runs_table} (
+                run_id VARCHAR(32) NOT NULL PRIMARY KEY,
+                strategy_name VARCHAR(64),
+                status VARCHAR(16) NOT NULL,
+                params TEXT,
+                timings TEXT,
+                started_at DATETIME,
+                finished_at DATETIME,
+                data_start DATETIME,
+                data_end DATETIME,
+                num_symbols INTEGER,
+                num_signals INTEGER,
+                num_trades INTEGER
+            )
+        """))
+
+def start_run(engine, runs_table: str, run_id: str, strategy_name: str, params: dict) -> bool:
+    """
+    Registers a new run in the run-metadata table with status 'running'.
+    `params` is stored as JSON so every run keeps the settings it was made with.
+    Returns False if the run could not be registered.
+    """
+    if engine is None:
+        return False
+
+    try:
+        ensure_runs_table(engine, runs_table)
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"INSERT INTO {runs_table} (run_id, strategy_name, status, params, started_at) "
+                     f"VALUES (:run_id, :strategy_name, 'running', :params, :started_at)"),
+                {
+                    "run_id": run_id,
+                    "strategy_name": strategy_name,
+                    "params": json.dumps(params, default=str),
+                    "started_at": datetime.now(),
+                }
+            )
+        logging.info(f"Registered run {run_id} in {runs_table}.")
+        return True
+    except Exception as e:
+        logging.error(f"Failed to register run {run_id}: {e}")
+        return False
+
+def finish_run(engine, runs_table: str, run_id: str, status: str, run_info: dict):
+    """
+    Marks a run as finished and records its timings, data window and row counts.
+    `run_info` may contain: timings (dict), data_start, data_end,
+    num_symbols, num_signals, num_trades.
+    """
+    if engine is None:
+        return
+
+    data_start = run_info.get("data_start")
+    data_end = run_info.get("data_end")
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"UPDATE {runs_table} SET status = :status, timings = :timings, "
+                     f"finished_at = :finished_at, data_start = :data_start, data_end = :data_end, "
+                     f"num_symbols = :num_symbols, num_signals = :num_signals, num_trades = :num_trades "
+                     f"WHERE run_id = :run_id"),
+                {
+                    "run_id": run_id,
+                    "status": status,
+                    "timings": json.dumps(run_info.get("timings", {})),
+                    "finished_at": datetime.now(),
+                    # Store the window as naive exchange-local time (DATETIME has no tz)
+                    "data_start": data_start.replace(tzinfo=None) if data_start is not None else None,
+                    "data_end": data_end.replace(tzinfo=None) if data_end is not None else None,
+                    "num_symbols": run_info.get("num_symbols"),
+                    "num_signals": run_info.get("num_signals"),
+                    "num_trades": run_info.get("num_trades"),
+                }
+            )
+        logging.info(f"Run {run_id} marked as '{status}'.")
+    except Exception as e:
+        logging.error(f"Failed to finalize run {run_id}: {e}")
+
+def _prepare_results_table(engine, table_name: str):
+    """
+    Moves a pre-versioning results table (one without a run_id column) out of
+    the way, so old results are kept and new runs get a fresh, indexed table.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(table_name):
+        return
+
+    columns = {col["name"] for col in inspector.get_columns(table_name)}
+    if "run_id" not in columns:
+        legacy_name = f"{table_name}_legacy"
+        logging.warning(f"Table {table_name} has no run_id column. Renaming it to {legacy_name}.")
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table_name} RENAME TO {legacy_name}"))
+
+def _ensure_results_index(engine, table_name: str):
+    """Creates the (run_id, Symbol, Signal_Timestamp) index used by the results API."""
+    index_name = f"idx_{table_name}_run"
+    existing = {idx["name"] for idx in inspect(engine).get_indexes(table_name)}
+    if index_name in existing:
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX {index_name} ON {table_name} (run_id, Symbol, Signal_Timestamp)"))
+    logging.info(f"Database index created on {table_name} (run_id, Symbol, Signal_Timestamp).")
+
+# Column layouts of the output tables, as to_sql creates them from the fetched
+# candles, the strategy's signals and the backtester's trades (DOUBLE = Float(53)).
+CANDLE_COLUMNS = [
+    ('timestamp', DateTime), ('open', Float(53)), ('high', Float(53)), ('low', Float(53)),
+    ('close', Float(53)), ('volume', BigInteger), ('open_interest', Float(53)), ('Symbol', String(32)),
+]
+SIGNAL_COLUMNS = [
+    ('run_id', String(32)), ('Symbol', String(32)), ('Signal', Text), ('Signal_Timestamp', DateTime),
+    ('Entry_Price', Float(53)), ('Stop_Loss', Float(53)), ('Take_Profit', Float(53)),
+]
+TRADE_COLUMNS = [
+    ('run_id', String(32)), ('Symbol', String(32)), ('Signal_Timestamp', DateTime),
+    ('Entry_Price', Float(53)), ('Stop_Loss', Float(53)), ('Take_Profit', Float(53)),
+    ('Exit_Timestamp', DateTime), ('Exit_Price', Float(53)), ('Outcome', Text), ('Profit_Loss', Float(53)),
+]
+
+def _create_table(engine, table_name: str, columns: list):
+    """Creates `table_name` with the given (name, type) columns unless it already exists."""
+    table = Table(table_name, MetaData(), *[Column(name, type_) for name, type_ in columns])
+    table.create(engine, checkfirst=True)
+
+def prepare_output_tables(engine, raw_table: str, signals_table: str, backtest_table: str):
+    """
+    Creates the candle, signals and trades tables and their indexes up front,
+    after moving pre-versioning results tables out of the way. Distributed runs
+    call this before queueing jobs, so workers only ever delete and append rows.
+    """
+    _create_table(engine, raw_table, CANDLE_COLUMNS)
+    if "idx_symbol_timestamp" not in {idx["name"] for idx in inspect(engine).get_indexes(raw_table)}:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX idx_symbol_timestamp ON {raw_table} (Symbol, timestamp)"))
+
+    for table_name, columns in ((signals_table, SIGNAL_COLUMNS), (backtest_table, TRADE_COLUMNS)):
+        _prepare_results_table(engine, table_name)
+        _create_table(engine, table_name, columns)
+        _ensure_results_index(engine, table_name)
+    logging.info(f"Output tables {raw_table}, {signals_table} and {backtest_table} are ready.")
+
+def save_results_to_db(df: pd.DataFrame, engine, table_name: str, run_id: str) -> bool:
     """
     Saves a results (signals or backtest) DataFrame to a SQL database table.
+    Rows are tagged with `run_id` and appended, so earlier runs are preserved.
+    Returns False if the rows could not be saved, so callers can fail the run.
     """
     if engine is None:
         logging.error("Database engine is not available. Cannot save results.")
-        return
+        return False
+
+    if df.empty:
+        logging.info(f"No rows to save to {table_name} for run {run_id}.")
+        return True
 
     try:
-        # Use if_exists='replace' to overwrite old results
-        df.to_sql(table_name, con=engine, if_exists='replace', index=False)
-        logging.info(f"Successfully saved results to database table: {table_name}")
+        _prepare_results_table(engine, table_name)
+
+        df_to_save = df.copy()
+        df_to_save.insert(0, 'run_id', run_id)
+
+        # Fixed-width key columns so MySQL can index them (TEXT needs a prefix length)
+        df_to_save.to_sql(
+            table_name,
+            con=engine,
+            if_exists='append',
+            index=False,
+            dtype={'run_id': String(32), 'Symbol': String(32)}
+        )
+        _ensure_results_index(engine, table_name)
+        logging.info(f"Successfully saved {len(df_to_save)} rows for run {run_id} to database table: {table_name}")
+        return True
 
     except Exception as e:
         # This will catch connection errors, auth errors, etc.
-        logging.error(f"Failed to save results to {table_name}: {e}")
\ No newline at end of file
+        logging.error(f"Failed to save results to {table_name}: {e}")
+        return False
+
+def append_candle_data(conn, df: pd.DataFrame, table_name: str):
+    """
+    Appends candle rows (indexed by 'timestamp') on an open connection, inside the
+    caller's transaction. Errors are raised so the caller's transaction rolls back.
+    """
+    if not df.empty:
+        df.reset_index().to_sql(table_name, con=conn, if_exists='append', index=False)
+
+def append_results(conn, df: pd.DataFrame, table_name: str, run_id: str):
+    """
+    Appends results rows tagged with `run_id` on an open connection, inside the
+    caller's transaction. The table must exist (see prepare_output_tables).
+    """
+    if not df.empty:
+        df.assign(run_id=run_id).to_sql(table_name, con=conn, if_exists='append', index=False)
+
+def delete_symbol_rows(conn, table_name: str, symbols: list, run_id: str = None):
+    """
+    Deletes the rows of `symbols` (optionally only for `run_id`) from a table,
+    on an open connection inside the caller's transaction.
+    Used before re-writing a batch so a retried batch doesn't duplicate rows.
+    """
+    if not symbols or not inspect(conn).has_table(table_name):
+        return
+
+    where = "Symbol IN :symbols"
+    params = {"symbols": list(symbols)}
+    if run_id is not None:
+        where += " AND run_id = :run_id"
+        params["run_id"] = run_id
+
+    query = text(f"DELETE FROM {table_name} WHERE {where}").bindparams(bindparam("symbols", expanding=True))
+    deleted = conn.execute(query, params).rowcount
+    if deleted:
+        logging.info(f"Deleted {deleted} existing rows for {len(symbols)} symbols from {table_name}.")
@@ -0,0 +1,185 @@
+import os
+import time
+import socket
+import logging
+import threading
+import pandas as pd
+
+# Import from our config and modules
+import config
+from src.utils import (
+    setup_logging,
+    get_db_engine,
+    ensure_runs_table,
+    append_candle_data,
+    append_results,
+    delete_symbol_rows
+)
+from src.data_fetcher import get_api_client
+from src.candle_store import CandleStore
+from src.pipeline import (
+    fetch_all_stocks,
+    split_by_symbol,
+    load_via_candle_store,
+    build_session_indexes,
+    generate_all_signals
+)
+from src.backtester import backtest_strategy_combined
+from src.job_queue import (
+    ensure_jobs_table,
+    claim_job,
+    heartbeat,
+    lock_owned_job,
+    complete_job,
+    fail_job
+)
+
+def _heartbeat_loop(engine, job_id: int, worker_id: str, stop_event: threading.Event):
+    """Keeps a job's claim alive until `stop_event` is set or the claim is lost."""
+    while not stop_event.wait(config.WORKER_HEARTBEAT_SECONDS):
+        try:
+            if not heartbeat(engine, config.JOBS_TABLE_NAME, job_id, worker_id):
+                logging.warning(f"Lost claim on job {job_id}; it was re-queued.")
+                return
+        except Exception as e:
+            # A missed heartbeat is not fatal; the claim only expires after WORKER_STALE_SECONDS
+            logging.error(f"Heartbeat for job {job_id} failed: {e}")
+
+def process_job(api, engine, job: dict, worker_id: str, candle_store: CandleStore = None) -> dict:
+    """
+    Fetches, generates signals and backtests one batch of symbols, then writes
+    the batch's candles, signals and trades. With a `candle_store` (shared by all
+    workers on the host), the batch is cached there and read back memory-mapped. Returns the batch statistics,
+    or None if the claim was lost and the results were discarded.
+    """
+    run_id = job["run_id"]
+    symbols = [stock['Symbol'] for stock in job["symbols"]]
+    # Use the settings recorded on the run, not this (long-lived) process's config
+    settings = job["params"]
+    stats = {}
+
+    stage_start = time.perf_counter()
+    combined_raw_data_df = fetch_all_stocks(api, pd.DataFrame(job["symbols"]), settings)
+    stats["fetch_seconds"] = round(time.perf_counter() - stage_start, 3)
+
+    all_stocks_data_dict = {}
+    signals_df = pd.DataFrame()
+    trades_df = pd.DataFrame()
+    if not combined_raw_data_df.empty:
+        stats["data_start"] = combined_raw_data_df.index.min()
+        stats["data_end"] = combined_raw_data_df.index.max()
+
+        stage_start = time.perf_counter()
+        all_stocks_data_dict = load_via_candle_store(candle_store, combined_raw_data_df, settings)
+        if not all_stocks_data_dict:
+            all_stocks_data_dict = split_by_symbol(combined_raw_data_df)
+        session_indexes = build_session_indexes(all_stocks_data_dict, settings)
+        signals_df = generate_all_signals(all_stocks_data_dict, session_indexes, settings)
+        stats["signals_seconds"] = round(time.perf_counter() - stage_start, 3)
+
+        if not signals_df.empty:
+            stage_start = time.perf_counter()
+            trades_df = backtest_strategy_combined(signals_df, all_stocks_data_dict, session_indexes)
+            stats["backtest_seconds"] = round(time.perf_counter() - stage_start, 3)
+    else:
+        logging.warning(f"No data fetched for any symbol in job {job['job_id']}.")
+
+    stats["num_symbols"] = len(all_stocks_data_dict)
+    stats["num_signals"] = len(signals_df)
+    stats["num_trades"] = len(trades_df)
+
+    # Delete-then-insert makes a retried batch idempotent. It runs in one
+    # transaction that starts by locking the job row, so a worker that lost its
+    # claim can't overwrite the results of the worker that took the job over.
+    # Jobs cover different symbols, so their writes don't need to take turns.
+    # A failed write raises and rolls back, and run_claimed_job hands the job to fail_job.
+    with engine.begin() as conn:
+        if not lock_owned_job(conn, config.JOBS_TABLE_NAME, job["job_id"], worker_id):
+            logging.warning(f"Job {job['job_id']} is no longer ours. Discarding its results.")
+            return None
+
+        delete_symbol_rows(conn, config.RAW_DATA_TABLE_NAME, symbols)
+        append_candle_data(conn, combined_raw_data_df, config.RAW_DATA_TABLE_NAME)
+
+        delete_symbol_rows(conn, config.SIGNALS_TABLE_NAME, symbols, run_id=run_id)
+        append_results(conn, signals_df, config.SIGNALS_TABLE_NAME, run_id)
+
+        delete_symbol_rows(conn, config.BACKTEST_TABLE_NAME, symbols, run_id=run_id)
+        append_results(conn, trades_df, config.BACKTEST_TABLE_NAME, run_id)
+
+    return stats
+
+def run_claimed_job(api, engine, job: dict, worker_id: str, candle_store: CandleStore = None):
+    """Processes a claimed job with a background heartbeat and records its outcome."""
+    job_id = job["job_id"]
+    logging.info(f"Claimed job {job_id} (run {job['run_id']}, batch {job['batch_no']}, "
+                 f"attempt {job['attempt']}, {len(job['symbols'])} symbols).")
+
+    stop_event = threading.Event()
+    heartbeat_thread = threading.Thread(
+        target=_heartbeat_loop,
+        args=(engine, job_id, worker_id, stop_event),
+        name=f"Heartbeat-{job_id}",
+        daemon=True
+    )
+    heartbeat_thread.start()
+
+    try:
+        stats = process_job(api, engine, job, worker_id, candle_store)
+        if stats is not None and complete_job(engine, config.JOBS_TABLE_NAME, job_id, worker_id, stats):
+            logging.info(f"Job {job_id} done: {stats['num_signals']} signals, {stats['num_trades']} trades.")
+    except Exception as e:
+        logging.error(f"Job {job_id} failed: {e}", exc_info=True)
+        fail_job(engine, config.JOBS_TABLE_NAME, job_id, worker_id, str(e), config.JOB_MAX_ATTEMPTS)
+    finally:
+        stop_event.set()
+        heartbeat_thread.join()
+
+def main():
+    """
+    Worker loop for distributed mode: claims symbol batches from the jobs
+    table, processes them and records the outcome, until the process is stopped.
+    Run several of these (e.g. `docker compose up --scale worker=4`);
+    coordinator.py queues the batches and finalizes the run.
+    """
+    setup_logging()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    logging.info(f"Starting worker {worker_id}")
+
+    try:
+        api = get_api_client(config.ACCESS_TOKEN)
+    except Exception as e:
+        logging.error(f"Failed to initialize API client: {e}")
+        return
+
+    engine = get_db_engine(config.DATABASE_URL)
+    if engine is None:
+        logging.error("Failed to initialize DB engine. Exiting.")
+        return
+
+    candle_store = CandleStore(config.CANDLE_STORE_DIR, config.DATA_TIMEZONE) if config.USE_CANDLE_STORE else None
+
+    tables_ready = False
+    while True:
+        try:
+            if not tables_ready:
+                # claim_job joins the runs table, which may not exist before the first run
+                ensure_runs_table(engine, config.RUNS_TABLE_NAME)
+                ensure_jobs_table(engine, config.JOBS_TABLE_NAME)
+                tables_ready = True
+            job = claim_job(engine, config.JOBS_TABLE_NAME, config.RUNS_TABLE_NAME, worker_id,
+                            config.WORKER_STALE_SECONDS, config.JOB_MAX_ATTEMPTS,
+                            config.RUN_TIMEOUT_SECONDS)
+        except Exception as e:
+            # Typically the database is not up yet or restarting
+            logging.error(f"Failed to claim a job: {e}")
+            job = None
+
+        if job is None:
+            time.sleep(config.WORKER_POLL_SECONDS)
+            continue
+
+        run_claimed_job(api, engine, job, worker_id, candle_store)
+
+if __name__ == "__main__":
+    main()